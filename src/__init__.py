@@ -6,12 +6,11 @@ __version__ = "0.1.0"
 __author__ = "Gabriel Pontes"
 
 from .auth import create_spotify_client
-from .recommender import MusicRecommender
-from .analyzer import PlaylistAnalyzer, analyze_playlist
+from .analyzer import PlaylistAnalyzer, analyze_playlist, analyze_playlists_bulk
 
 __all__ = [
     "create_spotify_client",
-    "MusicRecommender", 
     "PlaylistAnalyzer",
     "analyze_playlist",
+    "analyze_playlists_bulk",
 ]
\ No newline at end of file
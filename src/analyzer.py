@@ -2,21 +2,59 @@
 Análise exploratória de playlists
 """
 
+import warnings
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
-import plotly.graph_objects as go
-import plotly.express as px
 
-from .data_extractor import extract_playlist_data
-from .config.settings import AUDIO_FEATURES
+from .data_extractor import extract_playlist_data, _get_shared_extractor, _fetch_parallel
+from .config.settings import AUDIO_FEATURES, AUDIO_FEATURES_SET
 from .utils import setup_logger, normalize_features
 
 logger = setup_logger(__name__)
 
+# As bibliotecas de visualização são importadas sob demanda nos métodos de
+# gráfico; este flag evita reaplicar o estilo global a cada gráfico
+_viz_configured = False
+
+# Ordem das features usada pelas regras de mood
+MOOD_FEATURES = ('danceability', 'energy', 'valence', 'acousticness', 'instrumentalness', 'speechiness')
+
+# Nomes dos moods indexados pelo código retornado por _mood_codes_vec
+MOOD_NAMES = (
+    "Energética/Dançante",
+    "Calma/Acústica",
+    "Feliz/Positiva",
+    "Melancólica/Triste",
+    "Instrumental",
+    "Falada/Poética",
+    "Mista/Equilibrada",
+)
+
+def _mood_codes_vec(arr: np.ndarray) -> np.ndarray:
+    """
+    Calcula o código de mood para várias playlists de uma vez
+    
+    Args:
+        arr: Matriz (n_playlists, 6) com as médias na ordem de MOOD_FEATURES
+        
+    Returns:
+        np.ndarray: Códigos int8 indexando MOOD_NAMES
+    """
+    d, e, v, a, i, s = np.asarray(arr, dtype=np.float64).T
+    # np.select escolhe a primeira condição verdadeira, como a cadeia de regras
+    conditions = [
+        (e > 0.7) & (d > 0.7),
+        (e < 0.3) & (a > 0.7),
+        v > 0.7,
+        v < 0.3,
+        i > 0.7,
+        s > 0.66,
+    ]
+    return np.select(conditions, np.arange(len(conditions)), default=len(conditions)).astype(np.int8)
+
 @dataclass
 class PlaylistProfile:
     """Perfil musical de uma playlist"""
@@ -33,14 +71,21 @@ class PlaylistProfile:
 class PlaylistAnalyzer:
     """Analisador de playlists"""
     
-    def __init__(self):
-        self.setup_visualization()
-    
     def setup_visualization(self):
         """Configura o estilo dos gráficos"""
+        global _viz_configured
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        
         plt.style.use('default')
         sns.set_style("whitegrid")
         sns.set_palette("husl")
+        _viz_configured = True
+    
+    def _ensure_visualization(self):
+        """Aplica o estilo dos gráficos na primeira vez que um gráfico é gerado"""
+        if not _viz_configured:
+            self.setup_visualization()
     
     def analyze_playlist(self, playlist_name: str) -> Optional[PlaylistProfile]:
         """
@@ -52,11 +97,28 @@ class PlaylistAnalyzer:
         Returns:
             PlaylistProfile: Perfil da playlist
         """
-        logger.info(f"Analisando playlist: {playlist_name}")
+        logger.info("Analisando playlist: %s", playlist_name)
         
         df = extract_playlist_data(playlist_name)
+        return self._analyze_df(df, playlist_name)
+    
+    def _analyze_df(self, df: Optional[pd.DataFrame], playlist_name: str,
+                    feature_matrix: Optional[Tuple[List[str], np.ndarray]] = None,
+                    with_mood: bool = True) -> Optional[PlaylistProfile]:
+        """
+        Calcula o perfil de uma playlist a partir de um DataFrame já extraído
+        
+        Args:
+            df: DataFrame com as músicas
+            playlist_name: Nome da playlist
+            feature_matrix: Resultado de _get_feature_matrix(df), se já calculado
+            with_mood: Se False, o mood fica vazio para ser calculado em lote
+            
+        Returns:
+            PlaylistProfile: Perfil da playlist
+        """
         if df is None or df.empty:
-            logger.error(f"Não foi possível analisar a playlist '{playlist_name}'")
+            logger.error("Não foi possível analisar a playlist '%s'", playlist_name)
             return None
         
         track_count = len(df)
@@ -64,17 +126,19 @@ class PlaylistAnalyzer:
         avg_duration = df['duration_ms'].mean() / 60000 
         avg_popularity = df['popularity'].mean()
         
-        features_mean = {}
-        features_std = {}
+        # Média e desvio das features direto na matriz NumPy (NaN ignorado, como no pandas)
+        present, arr = feature_matrix or self._get_feature_matrix(df)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            means = np.nanmean(arr, axis=0, dtype=np.float64)
+            stds = np.nanstd(arr, axis=0, dtype=np.float64, ddof=1)
         
-        for feature in AUDIO_FEATURES:
-            if feature in df.columns:
-                features_mean[feature] = df[feature].mean()
-                features_std[feature] = df[feature].std()
+        features_mean = dict(zip(present, means.tolist()))
+        features_std = dict(zip(present, stds.tolist()))
 
-        top_artists = df['artist'].value_counts().head(5).to_dict()
+        top_artists = self._top_artists(df, 5)
         
-        audio_mood = self._determine_mood(features_mean)
+        audio_mood = self._determine_mood(features_mean) if with_mood else ""
         
         profile = PlaylistProfile(
             name=playlist_name,
@@ -88,9 +152,37 @@ class PlaylistAnalyzer:
             audio_mood=audio_mood
         )
         
-        logger.info(f"Análise concluída para '{playlist_name}'")
+        logger.info("Análise concluída para '%s'", playlist_name)
         return profile
     
+    def _get_feature_matrix(self, df: pd.DataFrame) -> Tuple[List[str], np.ndarray]:
+        """
+        Retorna as audio features presentes no DataFrame e a matriz float32 correspondente
+        
+        A matriz é sempre montada a partir do estado atual do DataFrame; quem
+        precisa dela várias vezes (ex.: generate_analysis_report) calcula uma
+        vez e repassa aos métodos internos.
+        """
+        present = AUDIO_FEATURES_SET.intersection(df.columns)
+        features = [f for f in AUDIO_FEATURES if f in present]
+        return features, df[features].to_numpy(dtype=np.float32)
+    
+    def _top_artists(self, df: pd.DataFrame, n: int) -> Dict[str, int]:
+        """Retorna os n artistas mais frequentes, em ordem decrescente"""
+        artists, first_idx, counts = np.unique(
+            df['artist'].dropna().to_numpy(dtype=str), return_index=True, return_counts=True
+        )
+        if len(counts) > n:
+            # Seleção parcial: só os artistas com contagem >= n-ésima maior são ordenados
+            threshold = np.partition(counts, len(counts) - n)[len(counts) - n]
+            candidates = np.flatnonzero(counts >= threshold)
+        else:
+            candidates = np.arange(len(counts))
+        # Empates mantêm a ordem da primeira aparição, como value_counts
+        order = np.lexsort((first_idx[candidates], -counts[candidates]))[:n]
+        top = candidates[order]
+        return {str(artists[i]): int(counts[i]) for i in top}
+    
     def _determine_mood(self, features_mean: Dict[str, float]) -> str:
         """Determina o 'mood' da playlist baseado nas audio features"""
         mood_rules = [
@@ -108,6 +200,14 @@ class PlaylistAnalyzer:
         
         return "Mista/Equilibrada"
     
+    def _assign_moods(self, profiles: List[PlaylistProfile]):
+        """Determina o mood de vários perfis de uma vez (mesmas regras de _determine_mood)"""
+        if not profiles:
+            return
+        values = [[profile.features_mean.get(f, 0) for f in MOOD_FEATURES] for profile in profiles]
+        for profile, code in zip(profiles, _mood_codes_vec(values)):
+            profile.audio_mood = MOOD_NAMES[code]
+    
     def plot_feature_distribution(self, df: pd.DataFrame, save_path: Optional[str] = None):
         """
         Plota distribuição das audio features
@@ -116,12 +216,18 @@ class PlaylistAnalyzer:
             df: DataFrame com as músicas
             save_path: Caminho para salvar o gráfico (opcional)
         """
-        features_to_plot = [f for f in AUDIO_FEATURES if f in df.columns]
-        
+        self._plot_feature_distribution(*self._get_feature_matrix(df), save_path)
+    
+    def _plot_feature_distribution(self, features_to_plot: List[str], arr: np.ndarray,
+                                   save_path: Optional[str] = None):
+        """Plota a distribuição a partir da matriz de features já montada"""
         if not features_to_plot:
             logger.warning("Nenhuma audio feature disponível para plotar")
             return
         
+        import matplotlib.pyplot as plt
+        self._ensure_visualization()
+        
         n_features = len(features_to_plot)
         n_cols = 3
         n_rows = (n_features + n_cols - 1) // n_cols
@@ -129,9 +235,17 @@ class PlaylistAnalyzer:
         fig, axes = plt.subplots(n_rows, n_cols, figsize=(15, 4 * n_rows))
         axes = axes.ravel() if n_rows > 1 else [axes]
         
+        # Histogramas calculados direto no NumPy; o matplotlib só desenha as barras
+        histograms = []
+        for j in range(arr.shape[1]):
+            column = arr[:, j]
+            histograms.append(np.histogram(column[~np.isnan(column)], bins=20))
+        
         for i, feature in enumerate(features_to_plot):
             ax = axes[i]
-            ax.hist(df[feature], bins=20, alpha=0.7, edgecolor='black', color='skyblue')
+            counts, edges = histograms[i]
+            ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+                   alpha=0.7, edgecolor='black', color='skyblue')
             ax.set_title(f'Distribuição de {feature}', fontsize=12)
             ax.set_xlabel(feature)
             ax.set_ylabel('Frequência')
@@ -146,7 +260,7 @@ class PlaylistAnalyzer:
         
         if save_path:
             plt.savefig(save_path, dpi=300, bbox_inches='tight')
-            logger.info(f"Gráfico salvo em: {save_path}")
+            logger.info("Gráfico salvo em: %s", save_path)
         
         plt.show()
     
@@ -158,13 +272,28 @@ class PlaylistAnalyzer:
             df: DataFrame com as músicas
             save_path: Caminho para salvar o gráfico (opcional)
         """
-        features_to_plot = [f for f in AUDIO_FEATURES if f in df.columns]
-        
+        self._plot_correlation_matrix(*self._get_feature_matrix(df), save_path)
+    
+    def _plot_correlation_matrix(self, features_to_plot: List[str], arr: np.ndarray,
+                                 save_path: Optional[str] = None):
+        """Plota a matriz de correlação a partir da matriz de features já montada"""
         if len(features_to_plot) < 2:
             logger.warning("Poucas features para matriz de correlação")
             return
         
-        corr_matrix = df[features_to_plot].corr()
+        # np.corrcoef calcula a matriz inteira de uma vez (linhas com NaN são descartadas)
+        values = arr[~np.isnan(arr).any(axis=1)]
+        if len(values) < 2:
+            logger.warning("Poucas músicas com todas as features para matriz de correlação")
+            return
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = np.corrcoef(values, rowvar=False)
+        corr_matrix = pd.DataFrame(corr, index=features_to_plot, columns=features_to_plot)
+        
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        self._ensure_visualization()
         
         plt.figure(figsize=(10, 8))
         sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', center=0,
@@ -174,7 +303,7 @@ class PlaylistAnalyzer:
         
         if save_path:
             plt.savefig(save_path, dpi=300, bbox_inches='tight')
-            logger.info(f"Matriz de correlação salva em: {save_path}")
+            logger.info("Matriz de correlação salva em: %s", save_path)
         
         plt.show()
     
@@ -185,6 +314,8 @@ class PlaylistAnalyzer:
         Args:
             profile: Perfil da playlist
         """
+        import plotly.graph_objects as go
+        
         features = list(profile.features_mean.keys())
         values = list(profile.features_mean.values())
         
@@ -229,7 +360,7 @@ class PlaylistAnalyzer:
             return None
         
         # Cria perfil
-        profile = self.analyze_playlist(playlist_name)
+        profile = self._analyze_df(df, playlist_name)
         if profile is None:
             return None
         
@@ -266,6 +397,49 @@ def analyze_playlist(playlist_name: str) -> Optional[PlaylistProfile]:
     analyzer = PlaylistAnalyzer()
     return analyzer.analyze_playlist(playlist_name)
 
+def _analyze_one(item: Tuple[Optional[pd.DataFrame], str]) -> Optional[PlaylistProfile]:
+    """Analisa um DataFrame já extraído (função de topo para ser usada em outros processos)"""
+    df, playlist_name = item
+    return PlaylistAnalyzer()._analyze_df(df, playlist_name, with_mood=False)
+
+def analyze_playlists_bulk(playlist_names: List[str], use_processes: bool = False,
+                           max_workers: Optional[int] = None) -> Dict[str, Optional[PlaylistProfile]]:
+    """
+    Analisa várias playlists de uma vez
+    
+    A extração (I/O de rede) é feita em paralelo com threads. Os perfis são
+    calculados no próprio processo: cada um leva poucos milissegundos, menos
+    que o custo de iniciar um pool de processos.
+    
+    Args:
+        playlist_names: Nomes das playlists
+        use_processes: Se True, distribui o cálculo dos perfis entre processos
+            (com o método spawn, o chamador precisa do guard __main__)
+        max_workers: Número máximo de processos (padrão: número de CPUs)
+        
+    Returns:
+        Dict[str, PlaylistProfile]: Perfil de cada playlist (None se falhar)
+    """
+    if not playlist_names:
+        return {}
+    
+    extractor = _get_shared_extractor()
+    # Carrega a lista de playlists uma vez antes das threads, que passam a usar o cache
+    extractor.get_user_playlists()
+    dfs = _fetch_parallel(extractor.get_playlist_dataframe, playlist_names)
+    
+    items = list(zip(dfs, playlist_names))
+    if use_processes and len(items) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            profiles = list(executor.map(_analyze_one, items))
+    else:
+        profiles = [_analyze_one(item) for item in items]
+    
+    # Moods de todas as playlists em uma única avaliação vetorizada
+    PlaylistAnalyzer()._assign_moods([profile for profile in profiles if profile is not None])
+    
+    return dict(zip(playlist_names, profiles))
+
 def generate_analysis_report(playlist_name: str, save_plots: bool = False):
     """
     Gera e exibe um relatório completo de análise
@@ -282,8 +456,9 @@ def generate_analysis_report(playlist_name: str, save_plots: bool = False):
         print(f"❌ Não foi possível analisar a playlist '{playlist_name}'")
         return
     
-    # Cria perfil
-    profile = analyzer.analyze_playlist(playlist_name)
+    # Cria perfil (a matriz de features é montada uma vez e reaproveitada nos gráficos)
+    feature_matrix = analyzer._get_feature_matrix(df)
+    profile = analyzer._analyze_df(df, playlist_name, feature_matrix)
     if profile is None:
         return
     
@@ -309,11 +484,11 @@ def generate_analysis_report(playlist_name: str, save_plots: bool = False):
     
     # Gera visualizações
     if save_plots:
-        analyzer.plot_feature_distribution(df, f"{playlist_name}_distribution.png")
-        analyzer.plot_correlation_matrix(df, f"{playlist_name}_correlation.png")
+        analyzer._plot_feature_distribution(*feature_matrix, f"{playlist_name}_distribution.png")
+        analyzer._plot_correlation_matrix(*feature_matrix, f"{playlist_name}_correlation.png")
     else:
-        analyzer.plot_feature_distribution(df)
-        analyzer.plot_correlation_matrix(df)
+        analyzer._plot_feature_distribution(*feature_matrix)
+        analyzer._plot_correlation_matrix(*feature_matrix)
     
     # Gráfico interativo
     analyzer.create_interactive_radar_chart(profile)
@@ -2,17 +2,24 @@
 Autenticação com a API do Spotify
 """
 
+import functools
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
-from .config.settings import SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET, SPOTIFY_REDIRECT_URI, SCOPE
+from .config.settings import (
+    SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET, SPOTIFY_REDIRECT_URI, SCOPE, API_MAX_RETRIES
+)
 from .utils import setup_logger
 
 logger = setup_logger(__name__)
 
+@functools.lru_cache(maxsize=1)
 def create_spotify_client() -> spotipy.Spotify:
     """
     Cria e retorna um cliente autenticado do Spotify
     
+    O cliente é criado uma única vez por processo e reutilizado nas chamadas
+    seguintes, evitando repetir a autenticação e a consulta ao usuário.
+    
     Returns:
         spotipy.Spotify: Cliente autenticado
         
@@ -28,16 +35,21 @@ def create_spotify_client() -> spotipy.Spotify:
             cache_path=".spotify_cache"
         )
         
-        sp = spotipy.Spotify(auth_manager=auth_manager)
+        # A sessão do spotipy repete 429 (respeitando Retry-After) e 5xx
+        sp = spotipy.Spotify(
+            auth_manager=auth_manager,
+            retries=API_MAX_RETRIES,
+            status_retries=API_MAX_RETRIES
+        )
         
 
         user = sp.current_user()
-        logger.info(f"Autenticado como: {user.get('display_name', 'Usuário')}")
+        logger.info("Autenticado como: %s", user.get('display_name', 'Usuário'))
         
         return sp
         
     except Exception as e:
-        logger.error(f"Falha na autenticação: {e}")
+        logger.error("Falha na autenticação: %s", e)
         raise
 
 def test_connection() -> bool:
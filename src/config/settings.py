@@ -27,15 +27,24 @@ SCOPE = " ".join([
 ])
 
 # Audio Features for Analysis
-AUDIO_FEATURES = [
+AUDIO_FEATURES = (
     'danceability', 'energy', 'valence', 'acousticness',
     'instrumentalness', 'liveness', 'speechiness', 'tempo'
-]
+)
+AUDIO_FEATURES_SET = frozenset(AUDIO_FEATURES)
 
 # Recommendation Settings
 DEFAULT_NUM_RECOMMENDATIONS = 10
 MAX_CANDIDATE_TRACKS = 500
 
+# API
+MAX_API_WORKERS = 8  # requests simultâneos ao Spotify
+API_MAX_RETRIES = 3  # tentativas extras do spotipy em rate limit (HTTP 429) e erros 5xx
+
+# Cache
+CACHE_DIR = os.getenv("PRAUM_CACHE_DIR", ".praum_cache")
+PLAYLIST_CACHE_TTL = int(os.getenv("PLAYLIST_CACHE_TTL", "3600"))  # segundos
+
 # Logging
 DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
\ No newline at end of file
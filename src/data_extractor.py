@@ -2,28 +2,183 @@
 Extração de dados da API do Spotify
 """
 
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterable
 from .auth import create_spotify_client
-from .config.settings import AUDIO_FEATURES
-from .utils import setup_logger, format_duration
+from .config.settings import (
+    AUDIO_FEATURES, AUDIO_FEATURES_SET, CACHE_DIR, PLAYLIST_CACHE_TTL, MAX_API_WORKERS
+)
+from .utils import setup_logger, format_durations_vec
 
 logger = setup_logger(__name__)
 
+# A API do Spotify retorna no máximo 100 itens por request
+PAGE_SIZE = 100
+
+# Campos realmente usados de cada página de músicas (reduz o payload JSON)
+TRACK_FIELDS = (
+    "items(track(id,name,artists(id,name),album(id,name),"
+    "duration_ms,popularity,track_number,explicit)),total"
+)
+
+# Limita os requests simultâneos em todo o processo, mesmo com pools aninhados
+_API_SEMAPHORE = threading.BoundedSemaphore(MAX_API_WORKERS)
+
+def _call_api(func: Callable, *args, **kwargs) -> Any:
+    """
+    Executa uma chamada à API com no máximo MAX_API_WORKERS em andamento
+    
+    Rate limit (HTTP 429, respeitando Retry-After) e erros 5xx são repetidos
+    pela sessão do próprio spotipy, configurada em create_spotify_client.
+    """
+    with _API_SEMAPHORE:
+        return func(*args, **kwargs)
+
+def _fetch_parallel(func: Callable, args: Iterable) -> List[Any]:
+    """
+    Executa func(arg) para cada argumento em um pool de threads
+    
+    Returns:
+        List: Resultados na mesma ordem dos argumentos
+    """
+    args = list(args)
+    if not args:
+        return []
+    
+    results = [None] * len(args)
+    with ThreadPoolExecutor(max_workers=min(MAX_API_WORKERS, len(args))) as executor:
+        futures = {executor.submit(func, arg): i for i, arg in enumerate(args)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    
+    return results
+
+def _load_cache(filename: str, ttl: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Lê um arquivo JSON do diretório de cache
+
+    Args:
+        filename: Nome do arquivo dentro de CACHE_DIR
+        ttl: Validade em segundos (None = sem expiração)
+
+    Returns:
+        Dict: Conteúdo do cache, ou None se ausente/expirado/inválido
+    """
+    path = os.path.join(CACHE_DIR, filename)
+    try:
+        if ttl is not None and os.path.getmtime(path) < time.time() - ttl:
+            return None
+        with open(path, 'r', encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+def _cache_path(playlist_id: str, snapshot_id: str) -> str:
+    """Caminho do DataFrame em Parquet de uma playlist para um dado snapshot"""
+    safe_snapshot = snapshot_id.replace('/', '_')
+    return os.path.join(CACHE_DIR, f"{playlist_id}_{safe_snapshot}.parquet")
+
+def _downcast_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte as colunas para tipos menores, reduzindo o uso de memória
+    
+    Colunas de texto muito repetidas (artista, álbum) viram Categorical.
+    """
+    # Inteiros/bool não representam nulos: essas colunas só são convertidas se completas
+    exact_dtypes = {
+        'popularity': 'uint8',
+        'track_number': 'uint16',
+        'duration_ms': 'int32',
+        'explicit': 'bool',
+    }
+    dtypes = {
+        col: dtype for col, dtype in exact_dtypes.items()
+        if col in df.columns and df[col].notna().all()
+    }
+    dtypes.update({feature: 'float32' for feature in AUDIO_FEATURES if feature in df.columns})
+    df = df.astype(dtypes)
+    
+    for col in ('artist', 'artist_id', 'album', 'album_id'):
+        if col in df.columns and df[col].nunique() < len(df) // 2:
+            df[col] = df[col].astype('category')
+    
+    return df
+
+def _save_dataframe_cache(df: pd.DataFrame, playlist_id: str, cache_path: str) -> None:
+    """Grava o DataFrame em Parquet e remove os snapshots antigos da mesma playlist"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Grava em arquivo temporário e troca atomicamente: leitores nunca veem
+        # um Parquet truncado e os temporários não casam com o glob abaixo
+        with tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix='.tmp', delete=False) as fh:
+            tmp_path = fh.name
+        try:
+            df.to_parquet(tmp_path, compression='snappy')
+            os.replace(tmp_path, cache_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        
+        for old_path in glob.glob(os.path.join(CACHE_DIR, f"{playlist_id}_*.parquet")):
+            if old_path != cache_path:
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass  # Já removido por outra thread/processo
+    except Exception as e:
+        logger.warning("Não foi possível gravar o cache %s: %s", cache_path, e)
+
+def _save_cache(filename: str, data: Dict[str, Any]) -> None:
+    """Grava um dicionário como JSON no diretório de cache"""
+    path = os.path.join(CACHE_DIR, filename)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Arquivo temporário único: threads concorrentes não se sobrescrevem
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=CACHE_DIR,
+                                         suffix='.tmp', delete=False) as fh:
+            json.dump(data, fh, ensure_ascii=False)
+        os.replace(fh.name, path)
+    except OSError as e:
+        logger.warning("Não foi possível gravar o cache %s: %s", path, e)
+
 class DataExtractor:
     """Classe para extrair dados do Spotify"""
     
     def __init__(self):
         self.sp = create_spotify_client()
+        self._user_id = None
+    
+    @property
+    def user_id(self) -> str:
+        """ID do usuário autenticado (obtido uma única vez)"""
+        if self._user_id is None:
+            self._user_id = self.sp.current_user()['id']
+        return self._user_id
     
-    def get_user_playlists(self) -> Dict[str, str]:
+    def get_user_playlists(self, refresh: bool = False) -> Dict[str, str]:
         """
         Retorna todas as playlists do usuário
         
+        Args:
+            refresh: Se True, ignora o cache em disco e consulta a API
+        
         Returns:
             Dict[str, str]: Dicionário {nome_da_playlist: id_da_playlist}
         """
         try:
+            cache = _load_cache("playlists.json", ttl=PLAYLIST_CACHE_TTL) or {}
+            if not refresh and self.user_id in cache:
+                playlists = cache[self.user_id]
+                logger.info("Encontradas %d playlists (cache)", len(playlists))
+                return playlists
+            
             playlists = {}
             results = self.sp.current_user_playlists()
             
@@ -36,59 +191,89 @@ class DataExtractor:
                 else:
                     break
             
-            logger.info(f"Encontradas {len(playlists)} playlists")
+            cache[self.user_id] = playlists
+            _save_cache("playlists.json", cache)
+            
+            logger.info("Encontradas %d playlists", len(playlists))
             return playlists
             
         except Exception as e:
-            logger.error(f"Erro ao buscar playlists: {e}")
+            logger.error("Erro ao buscar playlists: %s", e)
             return {}
     
-    def get_playlist_tracks(self, playlist_id: str) -> List[Dict[str, Any]]:
+    def get_playlist_snapshot_id(self, playlist_id: str) -> str:
+        """Retorna o snapshot_id atual da playlist (muda a cada alteração)"""
+        return _call_api(self.sp.playlist, playlist_id, fields='snapshot_id')['snapshot_id']
+    
+    def get_playlist_tracks(self, playlist_id: str, refresh: bool = False,
+                            snapshot_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Extrai todas as músicas de uma playlist específica
         
+        As músicas ficam em cache por snapshot_id: enquanto a playlist não
+        for alterada no Spotify, o download completo é evitado.
+        
         Args:
             playlist_id: ID da playlist no Spotify
+            refresh: Se True, ignora o cache em disco e consulta a API
+            snapshot_id: snapshot_id já conhecido (evita consultar a API de novo)
             
         Returns:
             List[Dict]: Lista de dicionários com informações das músicas
+                (vazia em caso de erro, nunca parcial)
         """
-        tracks = []
-        
         try:
-            results = self.sp.playlist_tracks(playlist_id)
+            cache_file = f"tracks_{playlist_id}.json"
+            if snapshot_id is None:
+                snapshot_id = self.get_playlist_snapshot_id(playlist_id)
             
-            while results:
-                for item in results['items']:
-                    track = item['track']
-                    
-                    if track:  
-                        track_info = {
-                            'id': track['id'],
-                            'name': track['name'],
-                            'artist': track['artists'][0]['name'],
-                            'artist_id': track['artists'][0]['id'],
-                            'album': track['album']['name'],
-                            'album_id': track['album']['id'],
-                            'duration_ms': track['duration_ms'],
-                            'duration_formatted': format_duration(track['duration_ms']),
-                            'popularity': track['popularity'],
-                            'track_number': track['track_number'],
-                            'explicit': track.get('explicit', False)
-                        }
-                        tracks.append(track_info)
-                
-                if results['next']:
-                    results = self.sp.next(results)
-                else:
-                    break
+            cache = _load_cache(cache_file)
+            if not refresh and cache and cache.get('snapshot_id') == snapshot_id:
+                tracks = cache['tracks']
+                logger.info("Extraídas %d músicas da playlist %s (cache)", len(tracks), playlist_id)
+                return tracks
+            
+            # Só itens do tipo track (sem episódios de podcast) em todas as páginas
+            def fetch_page(offset: int) -> Dict[str, Any]:
+                return _call_api(
+                    self.sp.playlist_items, playlist_id, fields=TRACK_FIELDS,
+                    offset=offset, limit=PAGE_SIZE, additional_types=('track',)
+                )
+            
+            first_page = fetch_page(0)
+            
+            # Com o total conhecido, as páginas restantes são buscadas em paralelo
+            offsets = range(PAGE_SIZE, first_page['total'], PAGE_SIZE)
+            pages = [first_page] + _fetch_parallel(fetch_page, offsets)
+            
+            tracks = []
+            for results in pages:
+                tracks.extend(
+                    {
+                        'id': track['id'],
+                        'name': track['name'],
+                        'artist': track['artists'][0]['name'],
+                        'artist_id': track['artists'][0]['id'],
+                        'album': track['album']['name'],
+                        'album_id': track['album']['id'],
+                        'duration_ms': track['duration_ms'],
+                        'popularity': track['popularity'],
+                        'track_number': track['track_number'],
+                        'explicit': track.get('explicit', False)
+                    }
+                    for track in (item.get('track') for item in results['items'])
+                    # Ignora itens removidos, locais sem metadados e episódios
+                    if track and track.get('artists') and track.get('album')
+                )
             
-            logger.info(f"Extraídas {len(tracks)} músicas da playlist {playlist_id}")
+            _save_cache(cache_file, {'snapshot_id': snapshot_id, 'tracks': tracks})
+            
+            logger.info("Extraídas %d músicas da playlist %s", len(tracks), playlist_id)
+            return tracks
             
         except Exception as e:
-            logger.error(f"Erro ao extrair músicas da playlist: {e}")
-        
-        return tracks
+            logger.error("Erro ao extrair músicas da playlist: %s", e)
+            return []
     
     def get_audio_features_batch(self, track_ids: List[str]) -> List[Dict[str, Any]]:
         """
@@ -99,23 +284,26 @@ class DataExtractor:
             
         Returns:
             List[Dict]: Lista de dicionários com audio features
+                (vazia em caso de erro, nunca parcial)
         """
-        audio_features = []
-        
         try:
             # A API do Spotify limita a 100 tracks por request
-            for i in range(0, len(track_ids), 100):
-                batch = track_ids[i:i + 100]
-                features_batch = self.sp.audio_features(batch)
-                
+            batches = [track_ids[i:i + PAGE_SIZE] for i in range(0, len(track_ids), PAGE_SIZE)]
+            results = _fetch_parallel(
+                lambda batch: _call_api(self.sp.audio_features, batch),
+                batches
+            )
+            
+            audio_features = []
+            for features_batch in results:
                 audio_features.extend([f for f in features_batch if f])
             
-            logger.info(f"Obtidas audio features para {len(audio_features)} músicas")
+            logger.info("Obtidas audio features para %d músicas", len(audio_features))
+            return audio_features
             
         except Exception as e:
-            logger.error(f"Erro ao obter audio features: {e}")
-        
-        return audio_features
+            logger.error("Erro ao obter audio features: %s", e)
+            return []
     
     def get_track_features(self, track_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -131,7 +319,7 @@ class DataExtractor:
             features = self.sp.audio_features([track_id])
             return features[0] if features else None
         except Exception as e:
-            logger.error(f"Erro ao obter features da track {track_id}: {e}")
+            logger.error("Erro ao obter features da track %s: %s", track_id, e)
             return None
     
     def search_tracks(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
@@ -149,33 +337,50 @@ class DataExtractor:
             results = self.sp.search(q=query, type='track', limit=limit)
             tracks = results['tracks']['items']
             
-            logger.info(f"Encontradas {len(tracks)} tracks para busca: '{query}'")
+            logger.info("Encontradas %d tracks para busca: '%s'", len(tracks), query)
             return tracks
             
         except Exception as e:
-            logger.error(f"Erro na busca: {e}")
+            logger.error("Erro na busca: %s", e)
             return []
     
-    def get_playlist_dataframe(self, playlist_name: str) -> Optional[pd.DataFrame]:
+    def get_playlist_dataframe(self, playlist_name: str, refresh: bool = False) -> Optional[pd.DataFrame]:
         """
         Cria um DataFrame completo para uma playlist
         
         Args:
             playlist_name: Nome da playlist
+            refresh: Se True, ignora os caches em disco
             
         Returns:
             pd.DataFrame: DataFrame com todas as informações
         """
         try:
-            playlists = self.get_user_playlists()
+            playlists = self.get_user_playlists(refresh=refresh)
+            
+            if playlist_name not in playlists and not refresh:
+                # A playlist pode ter sido criada depois do último cache
+                playlists = self.get_user_playlists(refresh=True)
             
             if playlist_name not in playlists:
-                logger.error(f"Playlist '{playlist_name}' não encontrada")
+                logger.error("Playlist '%s' não encontrada", playlist_name)
                 return None
             
             playlist_id = playlists[playlist_name]
+            snapshot_id = self.get_playlist_snapshot_id(playlist_id)
+            
+            # O snapshot_id invalida o cache automaticamente quando a playlist muda
+            cache_path = _cache_path(playlist_id, snapshot_id)
+            if not refresh and os.path.exists(cache_path):
+                try:
+                    df = pd.read_parquet(cache_path)
+                    df['playlist_name'] = playlist_name
+                    logger.info("DataFrame carregado do cache com %d músicas", len(df))
+                    return df
+                except Exception as e:
+                    logger.warning("Cache %s inválido, extraindo novamente: %s", cache_path, e)
             
-            tracks = self.get_playlist_tracks(playlist_id)
+            tracks = self.get_playlist_tracks(playlist_id, refresh=refresh, snapshot_id=snapshot_id)
             
             if not tracks:
                 logger.error("Nenhuma música encontrada na playlist")
@@ -184,23 +389,40 @@ class DataExtractor:
             track_ids = [track['id'] for track in tracks]
             audio_features = self.get_audio_features_batch(track_ids)
             
-            for i, track in enumerate(tracks):
-                if i < len(audio_features) and audio_features[i]:
-                    for feature in AUDIO_FEATURES:
-                        if feature in audio_features[i]:
-                            track[feature] = audio_features[i][feature]
-            
+            # Junta as features às músicas pelo ID da track
             df = pd.DataFrame(tracks)
+            df['duration_formatted'] = format_durations_vec(df['duration_ms'].to_numpy())
+            if audio_features:
+                feat_df = pd.DataFrame(audio_features).drop_duplicates('id').set_index('id')
+                present = AUDIO_FEATURES_SET.intersection(feat_df.columns)
+                features = [f for f in AUDIO_FEATURES if f in present]
+                df = df.join(feat_df[features], on='id', how='left')
+            
+            df = _downcast_dataframe(df)
+            
+            # Músicas e features vêm completas ou vazias; sem features, a extração
+            # falhou e o resultado não é persistido
+            if audio_features:
+                _save_dataframe_cache(df, playlist_id, cache_path)
             
             df['playlist_name'] = playlist_name
             
-            logger.info(f"DataFrame criado com {len(df)} músicas e {len(df.columns)} colunas")
+            logger.info("DataFrame criado com %d músicas e %d colunas", len(df), len(df.columns))
             return df
             
         except Exception as e:
-            logger.error(f"Erro ao criar DataFrame: {e}")
+            logger.error("Erro ao criar DataFrame: %s", e)
             return None
 
+_SHARED_EXTRACTOR: Optional[DataExtractor] = None
+
+def _get_shared_extractor() -> DataExtractor:
+    """Retorna o DataExtractor compartilhado, criando-o na primeira chamada"""
+    global _SHARED_EXTRACTOR
+    if _SHARED_EXTRACTOR is None:
+        _SHARED_EXTRACTOR = DataExtractor()
+    return _SHARED_EXTRACTOR
+
 def extract_playlist_data(playlist_name: str) -> Optional[pd.DataFrame]:
     """
     Função principal de extração de dados
@@ -211,8 +433,7 @@ def extract_playlist_data(playlist_name: str) -> Optional[pd.DataFrame]:
     Returns:
         pd.DataFrame: DataFrame com os dados da playlist
     """
-    extractor = DataExtractor()
-    return extractor.get_playlist_dataframe(playlist_name)
+    return _get_shared_extractor().get_playlist_dataframe(playlist_name)
 
 if __name__ == "__main__":
     extractor = DataExtractor()
@@ -4,8 +4,13 @@ Funções utilitárias compartilhadas
 
 import logging
 from typing import List, Dict, Any
+import numpy as np
 import pandas as pd
 
+# Recíprocos pré-calculados das faixas de normalização
+_INV_TEMPO_RANGE = 1.0 / 200
+_INV_LOUDNESS_RANGE = 1.0 / 60
+
 def setup_logger(name: str = __name__) -> logging.Logger:
     """Configura um logger para o módulo"""
     logger = logging.getLogger(name)
@@ -23,29 +28,39 @@ def setup_logger(name: str = __name__) -> logging.Logger:
     
     return logger
 
-def normalize_features(df: pd.DataFrame) -> pd.DataFrame:
+def normalize_features(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
     """
     Normaliza features para análise comparativa
+    
+    Apenas as colunas normalizadas são alocadas; com inplace=False o
+    DataFrame original não é alterado (cópia rasa, sem duplicar os dados).
     """
-    df_normalized = df.copy()
+    df_normalized = df if inplace else df.copy(deep=False)
     
     # Normaliza tempo (BPM) para escala 0-1
     if 'tempo' in df_normalized.columns:
-        df_normalized['tempo_normalized'] = (df_normalized['tempo'] - 50) / 200  # Assume 50-250 BPM
+        df_normalized['tempo_normalized'] = (
+            (df_normalized['tempo'].to_numpy(np.float32) - 50.0) * _INV_TEMPO_RANGE  # Assume 50-250 BPM
+        )
     
     # Normaliza loudness para escala 0-1
     if 'loudness' in df_normalized.columns:
-        df_normalized['loudness_normalized'] = (df_normalized['loudness'] + 60) / 60  # -60 a 0 dB
+        df_normalized['loudness_normalized'] = (
+            (df_normalized['loudness'].to_numpy(np.float32) + 60.0) * _INV_LOUDNESS_RANGE  # -60 a 0 dB
+        )
     
     return df_normalized
 
 def format_duration(ms: int) -> str:
     """Formata milissegundos para MM:SS"""
-    seconds = int(ms / 1000)
-    minutes = seconds // 60
-    seconds = seconds % 60
+    minutes, seconds = divmod(int(ms) // 1000, 60)
     return f"{minutes}:{seconds:02d}"
 
+def format_durations_vec(ms_array: np.ndarray) -> List[str]:
+    """Formata um array de milissegundos para MM:SS (versão vetorizada)"""
+    minutes, seconds = np.divmod(np.asarray(ms_array, dtype=np.int64) // 1000, 60)
+    return [f"{m}:{s:02d}" for m, s in zip(minutes.tolist(), seconds.tolist())]
+
 def validate_playlist_name(playlist_name: str, available_playlists: Dict[str, str]) -> bool:
     """Valida se o nome da playlist existe"""
     return playlist_name in available_playlists
\ No newline at end of file
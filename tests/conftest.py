@@ -0,0 +1,5 @@
+import os
+
+# As configurações exigem credenciais já na importação do pacote
+os.environ.setdefault("SPOTIFY_CLIENT_ID", "test-client-id")
+os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "test-client-secret")
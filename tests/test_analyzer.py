@@ -0,0 +1,106 @@
+import warnings
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+
+from src import analyzer as analyzer_module
+from src.analyzer import (
+    MOOD_FEATURES, MOOD_NAMES, PlaylistAnalyzer, PlaylistProfile, _mood_codes_vec,
+    analyze_playlists_bulk,
+)
+
+
+def test_feature_matrix_reflects_dataframe_changes():
+    analyzer = PlaylistAnalyzer()
+    df = pd.DataFrame({'energy': [0.1, np.nan, 0.3], 'valence': [0.5, 0.6, 0.7]})
+
+    features, arr = analyzer._get_feature_matrix(df)
+    assert features == ['energy', 'valence']
+    assert arr.shape == (3, 2)
+
+    df.dropna(inplace=True)
+    df['energy'] = [0.9, 0.8]
+    features, arr = analyzer._get_feature_matrix(df)
+    assert arr.shape == (2, 2)
+    assert np.allclose(arr[:, 0], [0.9, 0.8])
+
+
+def test_top_artists_matches_value_counts_order():
+    artists = ['Zed'] * 3 + ['Yan', 'Xu', 'Wu', 'Vo', 'Ua', 'Ta', 'Sa', 'Ab', 'Bc', 'Cd', 'Xu']
+    df = pd.DataFrame({'artist': artists + [None]})
+
+    top = PlaylistAnalyzer()._top_artists(df, 5)
+
+    assert list(top.items()) == list(df['artist'].value_counts().head(5).items())
+    assert list(top) == ['Zed', 'Xu', 'Yan', 'Wu', 'Vo']
+
+
+def test_mood_codes_vec_matches_scalar_rules():
+    analyzer = PlaylistAnalyzer()
+    rng = np.random.default_rng(0)
+    # Valores nos limites das regras, NaN e aleatórios
+    candidates = np.array([0.0, 0.3, 0.66, 0.7, 1.0, np.nan])
+    rows = np.concatenate([
+        rng.choice(candidates, size=(2000, len(MOOD_FEATURES))),
+        rng.random((2000, len(MOOD_FEATURES))),
+    ])
+
+    codes = _mood_codes_vec(rows)
+
+    for row, code in zip(rows, codes):
+        features_mean = dict(zip(MOOD_FEATURES, row.tolist()))
+        assert MOOD_NAMES[code] == analyzer._determine_mood(features_mean)
+
+
+def test_assign_moods_uses_missing_features_as_zero():
+    profile = PlaylistProfile(
+        name='p', track_count=1, unique_artists=1, avg_duration=3.0, avg_popularity=50.0,
+        features_mean={'valence': 0.1}, features_std={}, top_artists={}, audio_mood=''
+    )
+    PlaylistAnalyzer()._assign_moods([profile])
+    assert profile.audio_mood == PlaylistAnalyzer()._determine_mood({'valence': 0.1})
+
+
+def make_playlist_df(energy):
+    return pd.DataFrame({
+        'id': ['t1', 't2', 't3'],
+        'artist': ['A', 'A', 'B'],
+        'duration_ms': [180000, 200000, 220000],
+        'popularity': [10, 20, 30],
+        'energy': [energy] * 3,
+        'danceability': [energy] * 3,
+        'valence': [0.5] * 3,
+    })
+
+
+def test_analyze_playlists_bulk_keeps_order_and_missing_playlists(monkeypatch):
+    frames = {'Festa': make_playlist_df(0.9), 'Calma': make_playlist_df(0.5)}
+    extractor = MagicMock()
+    extractor.get_playlist_dataframe.side_effect = frames.get
+    monkeypatch.setattr(analyzer_module, '_get_shared_extractor', lambda: extractor)
+
+    profiles = analyze_playlists_bulk(['Calma', 'Inexistente', 'Festa'])
+
+    assert list(profiles) == ['Calma', 'Inexistente', 'Festa']
+    assert profiles['Inexistente'] is None
+    assert profiles['Festa'].audio_mood == "Energética/Dançante"
+    assert profiles['Calma'].audio_mood == "Mista/Equilibrada"
+    assert profiles['Calma'].track_count == 3
+    assert profiles['Calma'].top_artists == {'A': 2, 'B': 1}
+
+
+def test_top_artists_matches_value_counts_on_random_playlists():
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        size = int(rng.integers(1, 60))
+        df = pd.DataFrame({'artist': rng.choice(list('ABCDEFGHIJ'), size=size)})
+        top = PlaylistAnalyzer()._top_artists(df, 5)
+        assert list(top.items()) == list(df['artist'].value_counts().head(5).items())
+
+
+def test_correlation_matrix_without_complete_rows_returns_quietly():
+    arr = np.array([[0.1, np.nan], [np.nan, 0.2]], dtype=np.float32)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert PlaylistAnalyzer()._plot_correlation_matrix(['energy', 'valence'], arr) is None
@@ -0,0 +1,263 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+import spotipy
+
+from src import auth, data_extractor
+from src.config.settings import API_MAX_RETRIES, MAX_API_WORKERS
+from src.data_extractor import DataExtractor, _call_api, _downcast_dataframe, _fetch_parallel
+
+
+def make_track(i):
+    return {
+        'id': f"t{i}",
+        'name': f"Música {i}",
+        'artists': [{'id': f"a{i % 7}", 'name': f"Artista {i % 7}"}],
+        'album': {'id': f"al{i % 5}", 'name': f"Álbum {i % 5}"},
+        'duration_ms': 180000 + i,
+        'popularity': i % 100,
+        'track_number': i % 12 + 1,
+        'explicit': False,
+    }
+
+
+def make_client(items, snapshot_id="snap-1"):
+    """Cliente falso que pagina `items` como a API do Spotify"""
+    sp = MagicMock()
+    sp.current_user.return_value = {'id': 'user-1'}
+    sp.current_user_playlists.return_value = {
+        'items': [{'name': 'Favoritas', 'id': 'pl-1'}],
+        'next': None,
+    }
+    sp.playlist.return_value = {'snapshot_id': snapshot_id}
+
+    def playlist_items(playlist_id, fields=None, limit=100, offset=0, **kwargs):
+        assert kwargs['additional_types'] == ('track',)
+        return {'items': items[offset:offset + limit], 'total': len(items)}
+
+    sp.playlist_items.side_effect = playlist_items
+    return sp
+
+
+@pytest.fixture
+def extractor(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_extractor, 'CACHE_DIR', str(tmp_path))
+
+    def build(sp):
+        monkeypatch.setattr(data_extractor, 'create_spotify_client', lambda: sp)
+        return DataExtractor()
+
+    return build
+
+
+def test_get_playlist_tracks_fetches_every_page_in_order(extractor):
+    items = [{'track': make_track(i)} for i in range(250)]
+    items[42] = {'track': None}
+    # Episódio sem artistas/álbum é ignorado sem interromper a página
+    items[150] = {'track': {'id': 'ep1', 'name': 'Episódio'}}
+    ext = extractor(make_client(items))
+
+    tracks = ext.get_playlist_tracks('pl-1')
+
+    expected = [f"t{i}" for i in range(250) if i not in (42, 150)]
+    assert [t['id'] for t in tracks] == expected
+    offsets = sorted(c.kwargs['offset'] for c in ext.sp.playlist_items.call_args_list)
+    assert offsets == [0, 100, 200]
+
+
+class FakeSpotifyAPI(BaseHTTPRequestHandler):
+    """API local que responde 429 nas primeiras `rate_limited` chamadas de audio-features"""
+    rate_limited = 0
+    retry_after = '0'
+    requests = []
+
+    def do_GET(self):
+        path = urlparse(self.path)
+        type(self).requests.append((path.path, time.monotonic()))
+        if '/audio-features' in path.path and type(self).rate_limited > 0:
+            type(self).rate_limited -= 1
+            self._reply(429, {'error': {'status': 429, 'message': 'rate limit'}},
+                        {'Retry-After': type(self).retry_after})
+        elif '/audio-features' in path.path:
+            ids = parse_qs(path.query)['ids'][0].split(',')
+            self._reply(200, {'audio_features': [{'id': i, 'energy': 0.5} for i in ids]})
+        else:
+            self._reply(200, {'id': 'user-1', 'display_name': 'Teste'})
+
+    def _reply(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def real_client(monkeypatch):
+    """Cliente criado por create_spotify_client, falando HTTP com a API local"""
+    FakeSpotifyAPI.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeSpotifyAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    auth_manager = MagicMock()
+    auth_manager.get_access_token.return_value = 'token'
+    monkeypatch.setattr(auth, 'SpotifyOAuth', lambda **kwargs: auth_manager)
+    prefix = f"http://127.0.0.1:{server.server_port}/v1/"
+
+    class LocalSpotify(spotipy.Spotify):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.prefix = prefix
+
+    monkeypatch.setattr(auth.spotipy, 'Spotify', LocalSpotify)
+    auth.create_spotify_client.cache_clear()
+
+    yield auth.create_spotify_client()
+
+    auth.create_spotify_client.cache_clear()
+    server.shutdown()
+    server.server_close()
+
+
+def test_rate_limit_is_retried_after_retry_after(real_client, monkeypatch):
+    monkeypatch.setattr(FakeSpotifyAPI, 'rate_limited', 1)
+    monkeypatch.setattr(FakeSpotifyAPI, 'retry_after', '1')
+    ext = DataExtractor()
+
+    features = ext.get_audio_features_batch(['t1', 't2'])
+
+    assert [f['id'] for f in features] == ['t1', 't2']
+    calls = [t for path, t in FakeSpotifyAPI.requests if '/audio-features' in path]
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 1
+
+
+def test_rate_limit_gives_up_after_max_retries(real_client, monkeypatch):
+    monkeypatch.setattr(FakeSpotifyAPI, 'rate_limited', 100)
+    ext = DataExtractor()
+
+    assert ext.get_audio_features_batch(['t1']) == []
+    calls = [p for p, _ in FakeSpotifyAPI.requests if '/audio-features' in p]
+    assert len(calls) == API_MAX_RETRIES + 1
+
+
+def test_playlists_cache_hit_and_refresh(extractor):
+    ext = extractor(make_client([]))
+
+    assert ext.get_user_playlists() == {'Favoritas': 'pl-1'}
+    assert ext.get_user_playlists() == {'Favoritas': 'pl-1'}
+    assert ext.sp.current_user_playlists.call_count == 1
+
+    ext.get_user_playlists(refresh=True)
+    assert ext.sp.current_user_playlists.call_count == 2
+
+
+def test_tracks_cache_hit_refresh_and_snapshot_invalidation(extractor):
+    items = [{'track': make_track(i)} for i in range(10)]
+    sp = make_client(items)
+    ext = extractor(sp)
+
+    first = ext.get_playlist_tracks('pl-1')
+    assert ext.get_playlist_tracks('pl-1') == first
+    assert sp.playlist_items.call_count == 1
+
+    ext.get_playlist_tracks('pl-1', refresh=True)
+    assert sp.playlist_items.call_count == 2
+
+    sp.playlist.return_value = {'snapshot_id': 'snap-2'}
+    ext.get_playlist_tracks('pl-1')
+    assert sp.playlist_items.call_count == 3
+
+
+def add_audio_features(sp):
+    sp.audio_features.side_effect = lambda ids: [
+        {'id': track_id, 'energy': 0.5, 'valence': 0.25} for track_id in ids
+    ]
+    return sp
+
+
+def test_get_playlist_tracks_returns_nothing_on_page_error(extractor, tmp_path):
+    items = [{'track': make_track(i)} for i in range(250)]
+    sp = make_client(items)
+    fetch = sp.playlist_items.side_effect
+
+    def failing_page(playlist_id, offset=0, **kwargs):
+        if offset == 200:
+            raise spotipy.SpotifyException(500, -1, 'erro')
+        return fetch(playlist_id, offset=offset, **kwargs)
+
+    sp.playlist_items.side_effect = failing_page
+    ext = extractor(sp)
+
+    assert ext.get_playlist_tracks('pl-1') == []
+    assert not (tmp_path / 'tracks_pl-1.json').exists()
+
+
+def test_dataframe_parquet_cache_replaces_old_snapshots(extractor, tmp_path):
+    pytest.importorskip('pyarrow')
+    items = [{'track': make_track(i)} for i in range(5)]
+    sp = add_audio_features(make_client(items))
+    ext = extractor(sp)
+
+    df = ext.get_playlist_dataframe('Favoritas')
+    assert len(df) == 5
+    assert (tmp_path / 'pl-1_snap-1.parquet').exists()
+
+    cached = ext.get_playlist_dataframe('Favoritas')
+    assert sp.audio_features.call_count == 1
+    assert cached['id'].tolist() == df['id'].tolist()
+
+    sp.playlist.return_value = {'snapshot_id': 'snap-2'}
+    ext.get_playlist_dataframe('Favoritas')
+    assert sorted(p.name for p in tmp_path.glob('*.parquet')) == ['pl-1_snap-2.parquet']
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_nested_parallel_calls_respect_max_api_workers():
+    lock = threading.Lock()
+    in_flight = [0, 0]  # atual, máximo
+
+    def api_call(_):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+
+    def outer(_):
+        _fetch_parallel(lambda arg: _call_api(api_call, arg), range(16))
+
+    _fetch_parallel(outer, range(8))
+
+    assert in_flight[1] <= MAX_API_WORKERS
+
+
+def test_downcast_skips_integer_columns_with_nulls():
+    df = pd.DataFrame({
+        'popularity': [10, None],
+        'track_number': [1, 2],
+        'duration_ms': [180000, 200000],
+        'explicit': [True, None],
+        'energy': [0.5, None],
+    })
+
+    out = _downcast_dataframe(df)
+
+    assert out['popularity'].isna().sum() == 1
+    assert out['track_number'].dtype == 'uint16'
+    assert out['duration_ms'].dtype == 'int32'
+    assert out['explicit'].isna().sum() == 1
+    assert out['energy'].dtype == 'float32'